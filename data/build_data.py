@@ -16,27 +16,59 @@ Optional overrides (auto-detected by default):
   --jumps-table Jumps
   --jump-from-col fromSystemId
   --jump-to-col   toSystemId
+
+Names output format (the web viewer loads json):
+  --names-format json|msgpack
 """
-import argparse, json, array, re
+import argparse, json, re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
 # Try to import sqlite3, fall back to pysqlite3 if the built-in is missing
 try:
     import sqlite3
 except ImportError:
     import pysqlite3 as sqlite3
 
+# Use orjson for faster JSON encoding when available, falling back to the stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# msgpack is only needed for --names-format msgpack
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 METERS_PER_LY = 9.4607304725808e15  # IAU light-year
+INV_METERS_PER_LY = 1.0 / METERS_PER_LY  # multiply by this instead of dividing by METERS_PER_LY
+ID_LOOKUP_MAX_SPAN = 16_000_000  # largest ID range id_mask() covers with a dense lookup table
+FETCH_BATCH_ROWS = 10_000  # system rows pulled from the cursor and converted per batch
+
+# V-### (e.g., V-001) and AD### (e.g., AD001) placeholder systems
+_FILTER_RE = re.compile(r'(?:V-\d{3}|AD\d{3})\Z', re.ASCII | re.IGNORECASE)
 
 def is_filtered_system(name):
     """Returns True if system should be filtered out (V-### or AD### patterns)"""
-    # Match V-### (e.g., V-001, V-123)
-    if re.match(r'^V-\d{3}$', name, re.IGNORECASE):
-        return True
-    # Match AD### (e.g., AD001, AD123)
-    if re.match(r'^AD\d{3}$', name, re.IGNORECASE):
-        return True
-    return False
+    return _FILTER_RE.match(name) is not None
+
+def filtered_name_sql(col):
+    """SQL counterpart of is_filtered_system(): true for V-### / AD### names, false (not NULL) otherwise"""
+    # GLOB is case-sensitive, so compare against the upper-cased name
+    return (f"COALESCE(UPPER({col}) GLOB 'V-[0-9][0-9][0-9]' "
+            f"OR UPPER({col}) GLOB 'AD[0-9][0-9][0-9]', 0)")
+
+def connect_readonly(db_path):
+    """Opens the DB read-only, tuned for one bulk scan (in-memory temp tables, large page cache, mmap I/O)"""
+    con = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute("PRAGMA cache_size=-65536")      # 64 MiB
+    con.execute("PRAGMA mmap_size=1073741824")   # 1 GiB
+    return con
 
 def infer_table(cur, needle_keywords):
     cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
@@ -61,11 +93,80 @@ def find_col(cols, candidates):
 
 def transform_xyz(xm, ym, zm):
     """Meters to light-years, then Rx(-90°): (x, y, z) -> (x, z, -y)."""
-    xly = float(xm) / METERS_PER_LY
-    yly = float(ym) / METERS_PER_LY
-    zly = float(zm) / METERS_PER_LY
+    xly = float(xm) * INV_METERS_PER_LY
+    yly = float(ym) * INV_METERS_PER_LY
+    zly = float(zm) * INV_METERS_PER_LY
     return (xly, zly, -yly)
 
+def transform_xyz_array(xyz):
+    """Vectorized transform_xyz over an (N, 3) array of meters; returns float32 (N, 3)."""
+    xyz = np.asarray(xyz, dtype=np.float64)
+    positions = np.empty(xyz.shape, dtype=np.float32)
+    # One multiply per output column, sign folded into the scale and cast straight
+    # into the float32 buffer, so no float64 temporaries are allocated
+    np.multiply(xyz[:, 0], INV_METERS_PER_LY, out=positions[:, 0], casting="same_kind")
+    np.multiply(xyz[:, 2], INV_METERS_PER_LY, out=positions[:, 1], casting="same_kind")
+    np.multiply(xyz[:, 1], -INV_METERS_PER_LY, out=positions[:, 2], casting="same_kind")
+    return positions
+
+def to_uint32_ids(values):
+    """Converts system IDs to a uint32 array, raising OverflowError for IDs that don't fit"""
+    ids = np.array(values, dtype=np.int64)
+    out_of_range = (ids < 0) | (ids > np.iinfo(np.uint32).max)
+    if out_of_range.any():
+        raise OverflowError(f"System IDs must fit in uint32; got {ids[out_of_range][:5].tolist()}")
+    return ids.astype(np.uint32)
+
+def id_mask(ids, members):
+    """Returns a bool array marking which of ids appear in members"""
+    ids = np.asarray(ids, dtype=np.int64)
+    members = np.asarray(members, dtype=np.int64)
+    if ids.size == 0 or members.size == 0:
+        return np.zeros(ids.shape, dtype=bool)
+    lo = min(ids.min(), members.min())
+    hi = max(ids.max(), members.max())
+    if hi - lo >= ID_LOOKUP_MAX_SPAN:
+        return np.isin(ids, members)
+    # Dense enough: one gather from a lookup table offset by the smallest ID
+    lookup = np.zeros(hi - lo + 1, dtype=bool)
+    lookup[members - lo] = True
+    return lookup[ids - lo]
+
+def canonical_jumps(jumps):
+    """Orders each (M, 2) jump pair as (low, high), drops duplicates and sorts by (a, b)"""
+    pairs = np.sort(jumps, axis=1)
+    # Pack each pair into one uint64 (a in the high word) so np.unique runs a plain
+    # 1-D sort, which also orders by (a, b), instead of sorting rows as void records
+    packed = np.unique((pairs[:, 0].astype(np.uint64) << np.uint64(32)) | pairs[:, 1])
+    out = np.empty((len(packed), 2), dtype=np.uint32)
+    out[:, 0] = packed >> np.uint64(32)
+    out[:, 1] = packed & np.uint64(0xFFFFFFFF)
+    return out
+
+def write_buffer(path, buf):
+    """Writes an array's raw bytes to path straight from its buffer, without an intermediate bytes copy"""
+    with open(path, "wb") as f:
+        f.write(buf)
+
+def json_bytes(obj, indent=False):
+    """Encodes obj as UTF-8 JSON bytes, with orjson if installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+def write_names_json(path, names):
+    """Writes an {id: name} map to path as a JSON object {"id":"name",...} in a single encode"""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS serializes the integer IDs as keys without str() per entry
+        data = orjson.dumps(names, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        data = json.dumps(names, ensure_ascii=False).encode("utf-8")
+    Path(path).write_bytes(data)
+
+def write_names_msgpack(path, names):
+    """Writes an {id: name} map to path as a MessagePack map with integer keys in a single encode"""
+    Path(path).write_bytes(msgpack.packb(names, use_bin_type=True))
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--db", required=True, help="Path to SQLite database")
@@ -80,13 +181,17 @@ def main():
     ap.add_argument("--jumps-table")
     ap.add_argument("--jump-from-col")
     ap.add_argument("--jump-to-col")
+    ap.add_argument("--names-format", choices=["json", "msgpack"], default="json",
+                    help="Format of the systems names file (the web viewer loads json)")
     args = ap.parse_args()
 
+    if args.names_format == "msgpack" and msgpack is None:
+        raise SystemExit("--names-format msgpack requires the msgpack package (pip install msgpack).")
+
     out_dir = Path(args.out)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    con = sqlite3.connect(args.db)
-    con.row_factory = sqlite3.Row
+    con = connect_readonly(args.db)
     cur = con.cursor()
 
     systems_table = args.systems_table or infer_table(cur, ["system"])
@@ -102,41 +207,54 @@ def main():
     y_col    = args.sys_y_col    or find_col(sys_cols, ["y","posy","position_y","world_y","centery"])
     z_col    = args.sys_z_col    or find_col(sys_cols, ["z","posz","position_z","world_z","centerz"])
 
-    # Load systems
-    cols = [id_col]
-    if name_col: cols.append(name_col)
-    if x_col: cols.append(x_col)
-    if y_col: cols.append(y_col)
-    if z_col: cols.append(z_col)
-    cur.execute(f"SELECT {', '.join(cols)} FROM {systems_table}")
-    systems = []
-    filtered_count = 0
-    for row in cur.fetchall():
-        sid = row[id_col]
-        nm = row[name_col] if (name_col and name_col in row.keys()) else str(sid)
-        
-        # Filter out V-### and AD### systems
-        if is_filtered_system(nm):
-            filtered_count += 1
-            continue
-        
-        xv = float(row[x_col]) if x_col else 0.0
-        yv = float(row[y_col]) if y_col else 0.0
-        zv = float(row[z_col]) if z_col else 0.0
-        systems.append((int(sid), nm, xv, yv, zv))
+    # Load systems, skipping V-### and AD### systems in SQL
+    # (missing columns are selected as constants so rows unpack positionally,
+    # and systems without a name fall back to their ID as text)
+    where = f" WHERE NOT {filtered_name_sql(name_col)}" if name_col else ""
+    cur.execute(f"SELECT COUNT(*) FROM {systems_table}")
+    total_count = cur.fetchone()[0]
+
+    id_text = f"CAST({id_col} AS TEXT)"
+    name_expr = f"COALESCE({name_col}, {id_text})" if name_col else id_text
+    cols = [id_col, name_expr, x_col or "0", y_col or "0", z_col or "0"]
+    cur.execute(f"SELECT {', '.join(cols)} FROM {systems_table}{where}")
+
+    # Stream the rows in batches into buffers sized for the whole table (filtering
+    # only shrinks it), converting each batch's columns in bulk
+    ids = np.empty(total_count, dtype=np.uint32)
+    xyz = np.empty((total_count, 3), dtype=np.float64)
+    names = {}
+    systems_count = 0
+    while batch := cur.fetchmany(FETCH_BATCH_ROWS):
+        sids, nms, xs, ys, zs = zip(*batch)
+        end = systems_count + len(batch)
+        ids[systems_count:end] = to_uint32_ids(sids)
+        xyz[systems_count:end] = np.array((xs, ys, zs), dtype=np.float64).T
+        names.update(zip(sids, nms))
+        systems_count = end
+    ids = ids[:systems_count]
+    xyz = xyz[:systems_count]
+    filtered_count = total_count - systems_count
+
+    # NULL coordinates convert to NaN; refuse to write them into the positions asset
+    bad = ~np.isfinite(xyz).all(axis=1)
+    if bad.any():
+        raise SystemExit(f"{int(bad.sum())} systems have NULL or non-finite coordinates "
+                         f"(e.g. IDs {ids[bad][:5].tolist()}); fix the data or the --sys-*-col overrides.")
 
     # Load systems with NPC stations
-    station_systems = set()
+    station_systems = np.empty(0, dtype=np.int64)
     try:
         cur.execute("SELECT DISTINCT solarSystemId FROM NpcStations WHERE solarSystemId IS NOT NULL")
-        for row in cur.fetchall():
-            station_systems.add(int(row[0]))
+        station_systems = np.fromiter((row[0] for row in cur), dtype=np.int64)
         print(f"Found {len(station_systems)} systems with NPC stations", file=__import__('sys').stderr)
     except Exception as e:
         print(f"Warning: Could not load NPC stations: {e}", file=__import__('sys').stderr)
 
-    # Load jumps
-    jumps = []
+    # Load jumps, joining against the surviving system IDs so SQLite drops
+    # connections to filtered or unknown systems
+    jumps_count = 0
+    jumps = np.empty((0, 2), dtype=np.uint32)
     if jumps_table:
         jmp_cols = get_cols(cur, jumps_table)
         def contains(parts):
@@ -148,59 +266,59 @@ def main():
         source_col = args.jump_from_col or contains(["from","id"]) or contains(["a","id"]) or contains(["source"])
         target_col = args.jump_to_col   or contains(["to","id"])   or contains(["b","id"]) or contains(["target"])
         if source_col and target_col:
-            cur.execute(f"SELECT {source_col} as s, {target_col} as t FROM {jumps_table}")
-            for r in cur.fetchall():
-                if r["s"] is not None and r["t"] is not None:
-                    jumps.append((int(r["s"]), int(r["t"])))
+            cur.execute(f"SELECT COUNT(*) FROM {jumps_table} "
+                        f"WHERE {source_col} IS NOT NULL AND {target_col} IS NOT NULL")
+            jumps_count = cur.fetchone()[0]
+
+            cur.execute("CREATE TEMP TABLE valid_ids (id INTEGER PRIMARY KEY)")
+            cur.executemany("INSERT OR IGNORE INTO valid_ids VALUES (?)", ((sid,) for sid in ids.tolist()))
+            cur.execute(f"SELECT j.{source_col}, j.{target_col} FROM {jumps_table} j "
+                        f"JOIN valid_ids a ON a.id = j.{source_col} "
+                        f"JOIN valid_ids b ON b.id = j.{target_col}")
+            jumps = np.fromiter(cur, dtype=np.dtype((np.uint32, 2)))
 
     con.close()
+    filtered_jumps = jumps_count - len(jumps)
 
-    # Build set of valid system IDs for jump filtering
-    valid_system_ids = {sid for sid, _, _, _, _ in systems}
+    # Gates are bidirectional: collapse a->b / b->a duplicates into one sorted edge list
+    loaded_jumps = len(jumps)
+    jumps = canonical_jumps(jumps)
+    duplicate_jumps = loaded_jumps - len(jumps)
 
-    # Build arrays
-    ids = array.array('I')
-    positions = array.array('f')
-    names = {}
-    station_ids = array.array('I')  # IDs of systems with stations
-
-    for sid, nm, x, y, z in systems:
-        ids.append(sid)
-        names[str(sid)] = nm
-        xt, yt, zt = transform_xyz(x, y, z)
-        positions.extend([xt, yt, zt])
-        
-        # Track systems with stations
-        if sid in station_systems:
-            station_ids.append(sid)
-
-    # Filter jumps to only include connections between valid systems
-    flat_jumps = array.array('I')
-    filtered_jumps = 0
-    for a, b in jumps:
-        if a in valid_system_ids and b in valid_system_ids:
-            flat_jumps.extend([a, b])
-        else:
-            filtered_jumps += 1
+    positions = transform_xyz_array(xyz)
+
+    # Track systems with stations
+    station_ids = ids[id_mask(ids, station_systems)]
 
-    # Write assets
-    (out_dir / "systems_positions.bin").write_bytes(positions.tobytes())
-    (out_dir / "systems_ids.bin").write_bytes(ids.tobytes())
-    (out_dir / "systems_names.json").write_text(json.dumps(names, ensure_ascii=False))
-    (out_dir / "jumps.bin").write_bytes(flat_jumps.tobytes())
-    (out_dir / "systems_with_stations.bin").write_bytes(station_ids.tobytes())
+    # Write assets concurrently (file writes release the GIL, so the I/O overlaps)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        if args.names_format == "msgpack":
+            names_file, names_type = "systems_names.msgpack", "MsgpackMap"
+            names_write = pool.submit(write_names_msgpack, out_dir / names_file, names)
+        else:
+            names_file, names_type = "systems_names.json", "MapIdToName"
+            names_write = pool.submit(write_names_json, out_dir / names_file, names)
+        writes = [
+            names_write,
+            pool.submit(write_buffer, out_dir / "systems_positions.bin", positions),
+            pool.submit(write_buffer, out_dir / "systems_ids.bin", ids),
+            pool.submit(write_buffer, out_dir / "jumps.bin", jumps),
+            pool.submit(write_buffer, out_dir / "systems_with_stations.bin", station_ids),
+        ]
+        for write in writes:
+            write.result()  # re-raise any write error
 
     manifest = {
         "counts": {
-            "systems": len(systems),
+            "systems": systems_count,
             "jumps": len(jumps),
             "systems_with_stations": len(station_ids)
         },
         "schema": {
             "systems_positions.bin": {"type":"Float32Array","components":3},
             "systems_ids.bin": {"type":"Uint32Array"},
-            "systems_names.json": {"type":"MapIdToName"},
-            "jumps.bin": {"type":"Uint32Array","components":2,"meaning":"pairs of system IDs [a,b]"},
+            names_file: {"type":names_type},
+            "jumps.bin": {"type":"Uint32Array","components":2,"meaning":"unique pairs of system IDs [a,b], a<=b, sorted by (a,b)"},
             "systems_with_stations.bin": {"type":"Uint32Array","meaning":"IDs of systems with NPC stations"}
         },
         "coord_system": {
@@ -208,16 +326,17 @@ def main():
             "transform": "Rx(-90deg), i.e., (x,y,z)->(x,z,-y)"
         }
     }
-    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    (out_dir / "manifest.json").write_bytes(json_bytes(manifest, indent=True))
 
     print(json.dumps({
         "systems_table": systems_table,
         "jumps_table": jumps_table,
-        "systems_count": len(systems),
+        "systems_count": systems_count,
         "filtered_systems": filtered_count,
         "systems_with_stations": len(station_ids),
-        "jumps_count": len(flat_jumps) // 2,
+        "jumps_count": len(jumps),
         "filtered_jumps": filtered_jumps,
+        "duplicate_jumps": duplicate_jumps,
         "out": str(out_dir.resolve())
     }, indent=2))
 
@@ -14,12 +14,15 @@ print(f"Tables: {tables}\n")
 if tables:
     t = tables[0]
     cur.execute(f"PRAGMA table_info({t})")
-    cols = [r[1] for r in cur.fetchall()]
+    info = cur.fetchall()
+    cols = [r[1] for r in info]
     print(f"Table '{t}' columns: {cols}")
     
-    cur.execute(f"SELECT * FROM {t} LIMIT 3")
+    # Project a few non-BLOB columns so SQLite doesn't decode whole wide rows
+    sample_cols = [r[1] for r in info if 'BLOB' not in (r[2] or '').upper()][:8] or cols[:1]
+    cur.execute(f"SELECT {', '.join(sample_cols)} FROM {t} LIMIT 3")
     rows = cur.fetchall()
-    print(f"Sample rows from '{t}':")
+    print(f"Sample rows from '{t}' ({', '.join(sample_cols)}):")
     for row in rows:
         print(f"  {row}")
     
@@ -1,13 +1,34 @@
 """
 Unit tests for build_data.py coordinate transformation and data processing
 """
+import json
+import math
+import sqlite3
 import sys
 from pathlib import Path
 
 # Add data directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'data'))
 
-from build_data import transform_xyz, METERS_PER_LY
+import numpy as np
+import pytest
+
+import build_data
+from build_data import (
+    transform_xyz,
+    transform_xyz_array,
+    is_filtered_system,
+    filtered_name_sql,
+    connect_readonly,
+    to_uint32_ids,
+    id_mask,
+    canonical_jumps,
+    write_buffer,
+    write_names_json,
+    write_names_msgpack,
+    METERS_PER_LY,
+    ID_LOOKUP_MAX_SPAN,
+)
 
 
 def test_transform_xyz_origin():
@@ -56,7 +77,237 @@ def test_transform_xyz_negative_values():
     assert abs(z - (-10.0)) < 1e-10
 
 
+def test_transform_xyz_array_matches_scalar():
+    """Test vectorized transform agrees with transform_xyz row by row"""
+    xyz = np.array([
+        [0.0, 0.0, 0.0],
+        [METERS_PER_LY * 1.0, METERS_PER_LY * 2.0, METERS_PER_LY * 3.0],
+        [-METERS_PER_LY * 5.0, METERS_PER_LY * 10.0, -METERS_PER_LY * 3.0],
+    ])
+
+    positions = transform_xyz_array(xyz)
+
+    assert positions.dtype == np.float32
+    assert positions.shape == (3, 3)
+    for row, expected in zip(positions, (transform_xyz(*r) for r in xyz)):
+        assert np.allclose(row, expected, atol=1e-6)
+
+
+def test_transform_xyz_array_empty():
+    """Test vectorized transform handles an empty system list"""
+    positions = transform_xyz_array(np.empty((0, 3)))
+    assert positions.shape == (0, 3)
+    assert positions.tobytes() == b""
+
+
+def test_is_filtered_system():
+    """Test V-### and AD### placeholder systems are filtered, case-insensitively"""
+    for name in ("V-001", "v-123", "AD001", "ad999"):
+        assert is_filtered_system(name)
+    for name in ("V-1234", "AD12", "XV-001", "AD001B", "Jita", "V-001\n", "V-\u0661\u0662\u0663"):
+        assert not is_filtered_system(name)
+
+
+def test_filtered_name_sql_matches_is_filtered_system():
+    """Test the SQL name filter agrees with is_filtered_system"""
+    names = ["V-001", "v-123", "AD001", "ad999", "V-1234", "AD12", "XV-001", "AD001B", "Jita", "V-00a",
+             "V-\u0661\u0662\u0663", "AD\uff11\uff12\uff13"]
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE systems (name TEXT)")
+    con.executemany("INSERT INTO systems VALUES (?)", [(n,) for n in names] + [(None,)])
+
+    rows = con.execute(f"SELECT name, {filtered_name_sql('name')} FROM systems").fetchall()
+
+    assert dict(rows) == {**{n: int(is_filtered_system(n)) for n in names}, None: 0}
+
+
+def test_connect_readonly(tmp_path):
+    """Test the DB is opened read-only while temp tables still work"""
+    db = tmp_path / "static.db"
+    con = sqlite3.connect(db)
+    con.execute("CREATE TABLE systems (id INTEGER)")
+    con.commit()
+    con.close()
+
+    con = connect_readonly(db)
+    con.execute("CREATE TEMP TABLE valid_ids (id INTEGER PRIMARY KEY)")
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        con.execute("INSERT INTO systems VALUES (1)")
+    con.close()
+
+
+def test_to_uint32_ids():
+    """Test IDs convert to uint32 and out-of-range IDs raise instead of wrapping"""
+    ids = to_uint32_ids((30000001, 0, 2**32 - 1))
+    assert ids.dtype == np.uint32
+    assert ids.tolist() == [30000001, 0, 2**32 - 1]
+
+    for bad in (-1, 2**32 + 1):
+        with pytest.raises(OverflowError):
+            to_uint32_ids((7, bad))
+
+
+def test_id_mask_dense_ids():
+    """Test membership for IDs in a narrow range (lookup table path)"""
+    ids = np.array([30000001, 30000002, 30000003, 30000004], dtype=np.uint32)
+    mask = id_mask(ids, [30000004, 30000002, 30999999])
+    assert mask.tolist() == [False, True, False, True]
+
+
+def test_id_mask_sparse_ids():
+    """Test membership for IDs spread wider than the lookup table limit (np.isin path)"""
+    ids = np.array([1, ID_LOOKUP_MAX_SPAN + 5, 7], dtype=np.uint32)
+    mask = id_mask(ids, [ID_LOOKUP_MAX_SPAN + 5, 7])
+    assert mask.tolist() == [False, True, True]
+
+
+def test_id_mask_empty():
+    """Test empty ID or member lists produce an all-False mask"""
+    assert id_mask(np.array([1, 2], dtype=np.uint32), []).tolist() == [False, False]
+    assert id_mask(np.empty(0, dtype=np.uint32), [1]).tolist() == []
+
+
+def test_canonical_jumps():
+    """Test jump pairs are direction-normalized, deduplicated and sorted"""
+    jumps = np.array([[5, 2], [1, 3], [2, 5], [3, 1], [1, 2], [4, 4]], dtype=np.uint32)
+
+    result = canonical_jumps(jumps)
+
+    assert result.dtype == np.uint32
+    assert result.tolist() == [[1, 2], [1, 3], [2, 5], [4, 4]]
+    assert canonical_jumps(np.empty((0, 2), dtype=np.uint32)).shape == (0, 2)
+
+
+def test_write_buffer(tmp_path):
+    """Test arrays are written as their raw little-endian bytes"""
+    positions = np.arange(6, dtype=np.float32).reshape(2, 3)
+    write_buffer(tmp_path / "positions.bin", positions)
+    assert (tmp_path / "positions.bin").read_bytes() == positions.tobytes()
+
+    write_buffer(tmp_path / "empty.bin", np.empty((0, 2), dtype=np.uint32))
+    assert (tmp_path / "empty.bin").read_bytes() == b""
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_write_names_json(tmp_path, monkeypatch, use_orjson):
+    """Test names file parses back to the id -> name map, with and without orjson"""
+    if not use_orjson:
+        monkeypatch.setattr(build_data, "orjson", None)
+    elif build_data.orjson is None:
+        pytest.skip("orjson not installed")
+    path = tmp_path / "systems_names.json"
+    write_names_json(path, {30000001: "Jita", 30000002: 'Quote "Q" \\ Ünï', 30000003: ""})
+    assert json.loads(path.read_text(encoding="utf-8")) == {
+        "30000001": "Jita",
+        "30000002": 'Quote "Q" \\ Ünï',
+        "30000003": "",
+    }
+
+    write_names_json(path, {})
+    assert json.loads(path.read_text(encoding="utf-8")) == {}
+
+
+def test_write_names_msgpack(tmp_path):
+    """Test MessagePack names file unpacks to an int id -> name map"""
+    msgpack = pytest.importorskip("msgpack")
+    path = tmp_path / "systems_names.msgpack"
+    names = {30000001: "Jita", 30000002: "Ünï", 30000003: ""}
+
+    write_names_msgpack(path, names)
+
+    assert msgpack.unpackb(path.read_bytes(), strict_map_key=False) == names
+
+
 def test_meters_per_ly_constant():
     """Verify the METERS_PER_LY constant is correct"""
     # IAU definition: 1 ly = 9.4607304725808e15 meters
     assert METERS_PER_LY == 9.4607304725808e15
+
+
+def test_transform_xyz_within_one_ulp_of_division():
+    """Test reciprocal multiply stays within 1 ULP of dividing by METERS_PER_LY"""
+    for xm, ym, zm in [
+        (METERS_PER_LY, -2.5 * METERS_PER_LY, 1.0),
+        (-9.87654321e17, 1.23456789e17, 4.2e16),
+        (3.0e18, -7.77e15, -1.0e12),
+    ]:
+        expected = (xm / METERS_PER_LY, zm / METERS_PER_LY, -ym / METERS_PER_LY)
+        for got, want in zip(transform_xyz(xm, ym, zm), expected):
+            assert abs(got - want) <= math.ulp(want)
+
+
+def _make_static_db(path):
+    """Builds a small SolarSystems/Jumps/NpcStations DB covering the filtering edge cases"""
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE SolarSystems (solarSystemId INTEGER, name TEXT, centerX REAL, centerY REAL, centerZ REAL)")
+    con.execute("CREATE TABLE Jumps (fromSystemId INTEGER, toSystemId INTEGER)")
+    con.execute("CREATE TABLE NpcStations (stationId INTEGER, solarSystemId INTEGER)")
+    con.executemany("INSERT INTO SolarSystems VALUES (?, ?, ?, ?, ?)", [
+        (1, "Alpha", METERS_PER_LY, 2 * METERS_PER_LY, 3 * METERS_PER_LY),
+        (2, "Beta", 0.0, 0.0, 0.0),
+        (3, None, -METERS_PER_LY, 0.0, METERS_PER_LY),  # falls back to its ID as the name
+        (4, "V-001", 0.0, 0.0, 0.0),                      # filtered
+        (5, "ad123", 0.0, 0.0, 0.0),                      # filtered
+    ])
+    con.executemany("INSERT INTO Jumps VALUES (?, ?)", [
+        (1, 2), (2, 1),   # same gate in both directions
+        (3, 1),
+        (3, 4),           # to a filtered system
+        (None, 2),        # NULL endpoint
+        (2, 3),
+    ])
+    con.executemany("INSERT INTO NpcStations VALUES (?, ?)", [
+        (100, 2), (101, 2), (102, 4), (103, None),
+    ])
+    con.commit()
+    con.close()
+
+
+@pytest.mark.parametrize("names_format", ["json", "msgpack"])
+def test_main_end_to_end(tmp_path, monkeypatch, capsys, names_format):
+    """Test main() builds every asset, the manifest and the summary from a small DB"""
+    if names_format == "msgpack":
+        msgpack = pytest.importorskip("msgpack")
+    db = tmp_path / "static.db"
+    out = tmp_path / "out"
+    _make_static_db(db)
+    monkeypatch.setattr(build_data, "FETCH_BATCH_ROWS", 2)  # span several cursor batches
+    monkeypatch.setattr(sys, "argv", [
+        "build_data.py", "--db", str(db), "--out", str(out), "--names-format", names_format,
+    ])
+
+    build_data.main()
+
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["systems_count"] == 3
+    assert summary["filtered_systems"] == 2
+    assert summary["systems_with_stations"] == 1
+    assert summary["jumps_count"] == 3
+    assert summary["filtered_jumps"] == 1
+    assert summary["duplicate_jumps"] == 1
+
+    ids = np.fromfile(out / "systems_ids.bin", dtype=np.uint32)
+    assert ids.tolist() == [1, 2, 3]
+
+    positions = np.fromfile(out / "systems_positions.bin", dtype=np.float32).reshape(-1, 3)
+    assert np.allclose(positions, [[1, 3, -2], [0, 0, 0], [-1, 1, 0]])
+
+    jumps = np.fromfile(out / "jumps.bin", dtype=np.uint32).reshape(-1, 2)
+    assert jumps.tolist() == [[1, 2], [1, 3], [2, 3]]
+
+    stations = np.fromfile(out / "systems_with_stations.bin", dtype=np.uint32)
+    assert stations.tolist() == [2]
+
+    if names_format == "msgpack":
+        names_file, names_type = "systems_names.msgpack", "MsgpackMap"
+        names = msgpack.unpackb((out / names_file).read_bytes(), strict_map_key=False)
+        assert names == {1: "Alpha", 2: "Beta", 3: "3"}
+        assert not (out / "systems_names.json").exists()
+    else:
+        names_file, names_type = "systems_names.json", "MapIdToName"
+        names = json.loads((out / names_file).read_text(encoding="utf-8"))
+        assert names == {"1": "Alpha", "2": "Beta", "3": "3"}
+
+    manifest = json.loads((out / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["counts"] == {"systems": 3, "jumps": 3, "systems_with_stations": 1}
+    assert manifest["schema"][names_file] == {"type": names_type}